@@ -1,32 +1,36 @@
 import re
 from pathlib import Path
 from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import os
+import mmap
+from bisect import bisect_right
 
 HOME       = Path.home()
 DOWNLOADS  = HOME / "Downloads"
 RIS_FILE   = DOWNLOADS / "seuarquivo.ris"
+# abaixo disso o custo de despachar para processos supera o ganho
+PARALLEL_MIN = 20000
+# acima disso a DNF não é expandida: o AST é avaliado direto
+DNF_MAX = 64
 
 # ------------------ AST e DNF ------------------
 
 class Expr:
-    def eval(self, txt: str) -> bool:
-        raise NotImplementedError
+    """ Nó do AST da query; a avaliação é feita sobre as colunas de termos. """
+    def __repr__(self):
+        return expr_str(self)
 
 class Term(Expr):
+    # o texto já chega normalizado (minúsculas, sem espaços nas pontas):
+    # crie termos por make_term
     def __init__(self, term: str):
-        self.term = term.lower().strip()
-    def eval(self, txt: str) -> bool:
-        return self.term in txt.lower()
-    def __repr__(self):
-        return f'"{self.term}"'
+        self.term = term
 
 class NotOp(Expr):
     def __init__(self, child: Expr):
         self.child = child
-    def eval(self, txt: str) -> bool:
-        return not self.child.eval(txt)
-    def __repr__(self):
-        return f'NOT({self.child})'
 
 class BinOp(Expr):
     def __init__(self, left: Expr, right: Expr):
@@ -34,24 +38,58 @@ class BinOp(Expr):
         self.right = right
 
 class AndOp(BinOp):
-    def eval(self, txt: str) -> bool:
-        return self.left.eval(txt) and self.right.eval(txt)
-    def __repr__(self):
-        return f'({self.left} AND {self.right})'
+    pass
 
 class OrOp(BinOp):
-    def eval(self, txt: str) -> bool:
-        return self.left.eval(txt) or self.right.eval(txt)
-    def __repr__(self):
-        return f'({self.left} OR {self.right})'
+    pass
+
+def expr_str(expr: Expr) -> str:
+    """ Texto da expressão, ex.: ("a" AND NOT("b")); percurso com pilha
+    explícita, sem limite de profundidade. """
+    out = []
+    todo = [(expr, False)]
+    while todo:
+        e, done = todo.pop()
+        if isinstance(e, Term):
+            out.append(f'"{e.term}"')
+        elif not done:
+            todo.append((e, True))
+            if isinstance(e, NotOp):
+                todo.append((e.child, False))
+            else:
+                todo.append((e.right, False))
+                todo.append((e.left, False))
+        elif isinstance(e, NotOp):
+            out.append(f'NOT({out.pop()})')
+        else:
+            r = out.pop(); l = out.pop()
+            op = 'AND' if isinstance(e, AndOp) else 'OR'
+            out.append(f'({l} {op} {r})')
+    return out[0]
+
+# parênteses, operadores (palavra inteira) ou uma palavra solta de termo
+_TOKEN_RE = re.compile(
+    r'(\()|(\))|(?<![^()\s])(AND|OR|NOT)(?![^()\s])|([^()\s]+)',
+    re.IGNORECASE
+)
 
 def tokenize(q: str):
-    # Captura parênteses, operadores e termos (mesmo multi-palavra)
-    tokens = re.findall(
-        r'\(|\)|\bAND\b|\bOR\b|\bNOT\b|[^()\s]+(?:\s+[^()\s]+)*',
-        q, flags=re.IGNORECASE
-    )
-    return [t.strip() for t in tokens if t.strip()]
+    # Captura parênteses, operadores e termos (mesmo multi-palavra):
+    # palavras consecutivas, separadas só por espaço, formam um único termo
+    tokens, start, end = [], None, None
+    for m in _TOKEN_RE.finditer(q):
+        if m.lastindex == 4:
+            if start is None:
+                start = m.start()
+            end = m.end()
+            continue
+        if start is not None:
+            tokens.append(q[start:end])
+            start = None
+        tokens.append(m.group())
+    if start is not None:
+        tokens.append(q[start:end])
+    return tokens
 
 def shunting_yard(tokens):
     # Precedência: NOT > AND > OR
@@ -60,8 +98,11 @@ def shunting_yard(tokens):
     for tk in tokens:
         up = tk.upper()
         if up in prec:
-            # operadores binários e unários
-            while stack and stack[-1] != '(' and prec.get(stack[-1],0) >= prec[up]:
+            # operadores binários e unários; NOT é associativo à direita
+            # (NOT NOT x), os binários à esquerda
+            while stack and stack[-1] != '(' and (
+                    prec.get(stack[-1],0) > prec[up] or
+                    (up != 'NOT' and prec.get(stack[-1],0) == prec[up])):
                 output.append(stack.pop())
             stack.append(up)
         elif tk == '(':
@@ -69,6 +110,8 @@ def shunting_yard(tokens):
         elif tk == ')':
             while stack and stack[-1] != '(':
                 output.append(stack.pop())
+            if not stack:
+                raise ValueError("')' sem '(' correspondente")
             stack.pop()  # descarta '('
         else:
             output.append(tk)
@@ -79,21 +122,39 @@ def shunting_yard(tokens):
             output.append(op)
     return output
 
+# um único Term por texto de termo: conjunções da DNF e queries seguidas
+# compartilham o mesmo objeto
+_TERM_CACHE: dict = {}
+
+def make_term(s: str) -> Term:
+    s = s.lower().strip()
+    t = _TERM_CACHE.get(s)
+    if t is None:
+        t = _TERM_CACHE[s] = Term(s)
+    return t
+
 def build_ast(rpn):
+    """ Monta o AST a partir da RPN; ValueError se faltar operando a algum
+    operador ou sobrar mais de uma expressão (ex.: "a NOT b"). """
     stack = []
     for tk in rpn:
         up = tk.upper()
         if up == 'NOT':
+            if not stack:
+                raise ValueError("NOT sem operando")
             child = stack.pop()
             stack.append(NotOp(child))
-        elif up == 'AND':
+        elif up in ('AND', 'OR'):
+            if len(stack) < 2:
+                raise ValueError(f"{up} sem os dois operandos")
             right = stack.pop(); left = stack.pop()
-            stack.append(AndOp(left, right))
-        elif up == 'OR':
-            right = stack.pop(); left = stack.pop()
-            stack.append(OrOp(left, right))
+            stack.append(AndOp(left, right) if up == 'AND' else OrOp(left, right))
         else:
-            stack.append(Term(tk))
+            stack.append(make_term(tk))
+    if not stack:
+        raise ValueError("query vazia")
+    if len(stack) > 1:
+        raise ValueError("termos sem operador entre eles (use AND/OR)")
     return stack[0]
 
 def parse_query(q: str) -> Expr:
@@ -102,46 +163,460 @@ def parse_query(q: str) -> Expr:
     return build_ast(rpn)
 
 def ast_to_dnf(expr: Expr):
-    """ Converte o AST para Disjunctive Normal Form (lista de conjunções). """
-    if isinstance(expr, Term) or isinstance(expr, NotOp):
-        return [[expr]]
-    if isinstance(expr, OrOp):
-        return ast_to_dnf(expr.left) + ast_to_dnf(expr.right)
-    if isinstance(expr, AndOp):
-        left_clauses  = ast_to_dnf(expr.left)
-        right_clauses = ast_to_dnf(expr.right)
-        # produto cartesiano: todas combinações de cláusulas
-        return [l + r for l in left_clauses for r in right_clauses]
-    return []
+    """ Converte o AST para Disjunctive Normal Form (lista de conjunções).
+    Percurso com pilha explícita; o tamanho do resultado é limitado antes
+    por dnf_size, a profundidade do AST não. """
+    clauses = []
+    todo = [(expr, False)]
+    while todo:
+        e, done = todo.pop()
+        if not isinstance(e, BinOp):
+            clauses.append([[e]])
+        elif not done:
+            todo.append((e, True))
+            todo.append((e.right, False))
+            todo.append((e.left, False))
+        else:
+            right_clauses = clauses.pop(); left_clauses = clauses.pop()
+            if isinstance(e, OrOp):
+                clauses.append(left_clauses + right_clauses)
+            else:
+                # produto cartesiano: todas combinações de cláusulas
+                clauses.append([l + r for l in left_clauses
+                                for r in right_clauses])
+    return clauses[0]
 
-# ------------------ Parsing do RIS ------------------
+def dnf_size(expr: Expr) -> int:
+    """ Número de conjunções que ast_to_dnf geraria, sem montá-las
+    (percurso com pilha explícita, sem limite de profundidade). """
+    sizes = []
+    todo = [(expr, False)]
+    while todo:
+        e, done = todo.pop()
+        if not isinstance(e, BinOp):
+            sizes.append(1)
+        elif not done:
+            todo.append((e, True))
+            todo.append((e.right, False))
+            todo.append((e.left, False))
+        else:
+            r = sizes.pop(); l = sizes.pop()
+            sizes.append(l + r if isinstance(e, OrOp) else l * r)
+    return sizes[0]
 
-def parse_ris_entries(path: Path):
-    entries, current = [], []
-    with path.open('r', encoding='utf-8', errors='ignore') as f:
-        for ln in f:
-            current.append(ln.rstrip('\n'))
-            if ln.startswith('ER  -'):
-                entries.append(current)
-                current = []
-    if current:
-        entries.append(current)
-    return entries
+# opcodes do programa pós-fixo que avalia uma query sobre as colunas;
+# os saltos deixam o lado esquerdo na pilha como resultado quando ele já
+# decide o AND (vazio) ou o OR (cheio), pulando o lado direito
+OP_TERM, OP_NOT, OP_AND, OP_OR, OP_JZ, OP_JFULL = range(6)
+
+def compile_program(expr: Expr) -> list:
+    """ Achata o AST numa lista pós-fixa de (opcode, dado). O percurso usa
+    uma pilha explícita, então não há limite de profundidade da query. """
+    program, jumps = [], []
+    todo = [(expr, 0)]
+    while todo:
+        e, stage = todo.pop()
+        if isinstance(e, Term):
+            program.append((OP_TERM, e.term))
+        elif isinstance(e, NotOp):
+            if stage == 0:
+                todo.append((e, 1))
+                todo.append((e.child, 0))
+            else:
+                program.append((OP_NOT, None))
+        elif stage == 0:
+            todo.append((e, 1))
+            todo.append((e.left, 0))
+        elif stage == 1:
+            # destino do salto é preenchido quando o nó termina
+            jumps.append(len(program))
+            program.append((OP_JZ if isinstance(e, AndOp) else OP_JFULL, None))
+            todo.append((e, 2))
+            todo.append((e.right, 0))
+        else:
+            program.append((OP_AND if isinstance(e, AndOp) else OP_OR, None))
+            j = jumps.pop()
+            program[j] = (program[j][0], len(program))
+    return program
+
+def run_program(program: list, col, full: int) -> int:
+    """ Máquina de pilha: col(termo) -> coluna, full = máscara cheia. """
+    stack = []
+    push, pop = stack.append, stack.pop
+    pc, n = 0, len(program)
+    while pc < n:
+        op, data = program[pc]
+        pc += 1
+        if op == OP_TERM:
+            push(col(data))
+        elif op == OP_NOT:
+            push(full ^ pop())
+        elif op == OP_AND:
+            b = pop()
+            push(pop() & b)
+        elif op == OP_OR:
+            b = pop()
+            push(pop() | b)
+        elif op == OP_JZ:
+            if not stack[-1]:
+                pc = data
+        elif stack[-1] == full:
+            pc = data
+    return stack[0]
+
+def lit_key(c: Expr):
+    """ Assinatura canônica de um literal da DNF. """
+    if isinstance(c, Term):
+        return ('+', c.term)
+    if isinstance(c, NotOp) and isinstance(c.child, Term):
+        return ('-', c.child.term)
+    return ('?', repr(c))
+
+def conj_key(conj):
+    return frozenset(lit_key(c) for c in conj)
+
+def simplify_dnf(dnf):
+    """ Remove literais repetidos, conjunções contraditórias (t e NOT t),
+    conjunções duplicadas e as absorvidas por outra menor (A∧B∧C ∨ A∧B
+    equivale a A∧B). Mantém a ordem original das que sobram. """
+    conjs = []
+    for conj in dnf:
+        lits = {}
+        for c in conj:
+            lits.setdefault(lit_key(c), c)
+        key = frozenset(lits)
+        if any(('-', v) in key for sign, v in key if sign == '+'):
+            continue
+        conjs.append((key, list(lits.values())))
+    keys = {key for key, _ in conjs}
+    out, seen = [], set()
+    for key, conj in conjs:
+        if key in seen or any(k < key for k in keys):
+            continue
+        seen.add(key)
+        out.append(conj)
+    return out
+
+def expr_terms(expr: Expr) -> set:
+    """ Textos de todos os termos que aparecem no AST. """
+    out, todo = set(), [expr]
+    while todo:
+        e = todo.pop()
+        if isinstance(e, Term):
+            out.add(e.term)
+        elif isinstance(e, NotOp):
+            todo.append(e.child)
+        elif isinstance(e, BinOp):
+            todo.append(e.left); todo.append(e.right)
+    return out
+
+# ------------------ Avaliação em colunas ------------------
+# Cada termo vira uma coluna de bits sobre as entradas (bit i = entrada i
+# contém o termo). AND/OR/NOT da DNF passam a ser &, |, ^ sobre inteiros,
+# operando em todas as entradas de uma vez.
+
+_BIT_CHARS = bytes.maketrans(b'\x00\x01', b'01')
+
+def mask_from_flags(flags: bytearray) -> int:
+    """ Monta o bitset a partir de um byte 0/1 por item (bit 0 = 1º item). """
+    return int(flags.translate(_BIT_CHARS)[::-1], 2) if flags else 0
+
+def mask_positions(mask: int) -> str:
+    """ String de '0'/'1' indexável por posição de entrada. """
+    return bin(mask)[:1:-1]
+
+def mask_indices(mask: int):
+    """ Índices dos bits ligados, saltando os zeros com str.find. """
+    bits = mask_positions(mask)
+    i = bits.find('1')
+    while i >= 0:
+        yield i
+        i = bits.find('1', i + 1)
 
-def extract_tag(entry, tag):
-    prefix = tag + '  -'
-    return [ln[len(prefix):].strip() for ln in entry if ln.startswith(prefix)]
+class Corpus:
+    """ Textos de busca concatenados num único buffer de bytes, separados
+    por FIELD_SEP (que nenhum termo contém, então nenhum casamento atravessa
+    duas entradas), mais o offset inicial de cada texto. """
+    def __init__(self, texts):
+        sep = FIELD_SEP.encode()
+        self.buf = sep.join(texts)
+        starts, pos = [], 0
+        for t in texts:
+            starts.append(pos)
+            pos += len(t) + len(sep)
+        starts.append(pos)
+        self.starts = starts
+        self.n = len(texts)
+
+    def matches(self, tb: bytes, lo: int, hi: int):
+        """ Índices das entradas lo..hi-1 que contêm tb: bytes.find salta
+        direto de um casamento ao próximo e, achado um, recomeça na entrada
+        seguinte. """
+        find, starts = self.buf.find, self.starts
+        end = starts[hi] - 1
+        pos = find(tb, starts[lo], end)
+        while pos >= 0:
+            i = bisect_right(starts, pos) - 1
+            yield i
+            pos = find(tb, starts[i + 1], end)
+
+    def column(self, tb: bytes, lo: int, hi: int, cand=None) -> int:
+        """ Bitset (bit 0 = entrada lo) das entradas lo..hi-1 que contêm tb.
+        Com poucas candidatas, procura só dentro de cada uma delas. """
+        flags = bytearray(hi - lo)
+        if cand is None or cand.bit_count() * 4 >= hi - lo:
+            for i in self.matches(tb, lo, hi):
+                flags[i - lo] = 1
+        else:
+            find, starts = self.buf.find, self.starts
+            for i in mask_indices(cand):
+                if find(tb, starts[lo + i], starts[lo + i + 1] - 1) >= 0:
+                    flags[i] = 1
+        return mask_from_flags(flags)
+
+# "palavra": sequência de bytes ASCII de palavra ou de bytes não-ASCII
+# (todo caractere UTF-8 multibyte fica inteiro dentro de uma palavra)
+_WORD = re.compile(rb'[\w\x80-\xff]+')
+
+class WordIndex:
+    """ Índice invertido montado na carga: palavra -> entradas onde aparece.
+    Um termo feito só de bytes de palavra só casa dentro de uma palavra,
+    então sua coluna é a união das listas das palavras do vocabulário que o
+    contêm: mesma semântica de substring, varrendo só o vocabulário. """
+    def __init__(self, texts):
+        postings = {}
+        for i, text in enumerate(texts):
+            for w in set(_WORD.findall(text)):
+                postings.setdefault(w, []).append(i)
+        self.postings = list(postings.values())
+        self.vocab = Corpus(list(postings))
+        self.n = len(texts)
+
+    def column(self, tb: bytes):
+        """ Coluna de tb pelo índice, ou None se o termo é pouco seletivo:
+        com mais de n ocorrências somadas nas listas, unir as listas custa
+        mais que varrer o corpus. """
+        words, total = [], 0
+        for j in self.vocab.matches(tb, 0, self.vocab.n):
+            total += len(self.postings[j])
+            if total > self.n:
+                return None
+            words.append(j)
+        flags = bytearray(self.n)
+        for j in words:
+            for i in self.postings[j]:
+                flags[i] = 1
+        return mask_from_flags(flags)
+
+def scan_columns(corpus: Corpus, lo: int, hi: int, terms, known: dict) -> dict:
+    """ Colunas dos termos dados, para as entradas lo..hi-1. Se u é
+    substring de t, toda entrada com t também tem u: a busca de t só
+    considera as entradas que já contêm todos os termos conhecidos contidos
+    nele (por isso os menores vêm primeiro). Cada termo é codificado em
+    UTF-8 uma vez aqui. """
+    known = dict(known)
+    out = {}
+    for t in sorted(terms, key=len):
+        cand = None
+        for u, col in known.items():
+            if u in t:
+                cand = col if cand is None else cand & col
+        col = corpus.column(t.encode('utf-8'), lo, hi, cand)
+        known[t] = out[t] = col
+    return out
+
+# corpus em cada processo auxiliar (enviado uma vez, no início)
+_worker_corpus = None
+
+def _init_worker(corpus):
+    global _worker_corpus
+    _worker_corpus = corpus
+
+def _chunk_columns(lo: int, hi: int, terms, known: dict) -> dict:
+    return scan_columns(_worker_corpus, lo, hi, terms, known)
+
+class MaskCache:
+    """ Guarda, entre queries, a coluna de cada termo e a máscara das
+    conjunções já avaliadas (LRU). Termos de uma só palavra saem do índice
+    invertido; os demais são buscados no corpus, restritos às entradas que
+    têm as palavras que os compõem. Em arquivos grandes essa busca roda em
+    paralelo, cada processo com uma faixa de entradas. """
+    def __init__(self, texts, max_conj: int = 256):
+        self.corpus = Corpus(texts)
+        self.index = WordIndex(texts)
+        # palavras recusadas pelo índice (pouco seletivas)
+        self.dense = set()
+        n = self.corpus.n
+        self.full = (1 << n) - 1
+        self.cols = {}
+        self.conjs = OrderedDict()
+        self.max_conj = max_conj
+        self.pool = None
+        workers = os.cpu_count() or 1
+        if workers > 1 and n >= PARALLEL_MIN:
+            self.pool = ProcessPoolExecutor(workers, initializer=_init_worker,
+                                            initargs=(self.corpus,))
+            step = -(-n // workers)
+            self.ranges = [(lo, min(lo + step, n)) for lo in range(0, n, step)]
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def prefetch(self, terms):
+        """ Calcula de uma vez as colunas ainda ausentes. """
+        missing = [t for t in terms if t not in self.cols]
+        for t in missing:
+            tb = t.encode('utf-8')
+            words = [tb] if _WORD.fullmatch(tb) else _WORD.findall(tb)
+            # as palavras seletivas de um termo composto também entram no
+            # cache e, por serem substrings dele, restringem a busca abaixo;
+            # as demais ficam para a varredura do corpus
+            for w in words:
+                wt = w.decode('utf-8')
+                if wt in self.cols or wt in self.dense:
+                    continue
+                col = self.index.column(w)
+                if col is None:
+                    self.dense.add(wt)
+                else:
+                    self.cols[wt] = col
+        missing = [t for t in missing if t not in self.cols]
+        if not missing:
+            return
+        # só as colunas que podem restringir a busca de algum termo novo
+        known = {u: col for u, col in self.cols.items()
+                 if any(u in t for t in missing)}
+        if self.pool is None:
+            self.cols.update(scan_columns(self.corpus, 0, self.corpus.n,
+                                          missing, known))
+            return
+        futures = []
+        for lo, hi in self.ranges:
+            part = (1 << (hi - lo)) - 1
+            sub = {u: (col >> lo) & part for u, col in known.items()}
+            futures.append((lo, self.pool.submit(_chunk_columns, lo, hi,
+                                                 missing, sub)))
+        cols = dict.fromkeys(missing, 0)
+        for lo, fut in futures:
+            for t, m in fut.result().items():
+                cols[t] |= m << lo
+        self.cols.update(cols)
+
+    def column(self, term: str) -> int:
+        if term not in self.cols:
+            self.prefetch([term])
+        return self.cols[term]
+
+    def expr(self, e: Expr) -> int:
+        return run_program(compile_program(e), self.column, self.full)
+
+    def conj(self, conj) -> int:
+        key = conj_key(conj)
+        m = self.conjs.get(key)
+        if m is not None:
+            self.conjs.move_to_end(key)
+            return m
+        # uma conjunção já avaliada com parte dos literais desta tem um
+        # resultado que contém o desta: basta filtrar a máscara dela
+        base = max((k for k in self.conjs if k < key), key=len, default=None)
+        if base is None:
+            m, rest = self.full, key
+        else:
+            m, rest = self.conjs[base], key - base
+        # conjunção = AND dos termos positivos sem nenhum dos negados:
+        # os negados são unidos numa máscara só e removidos de uma vez
+        lits = {lit_key(c): c for c in conj}
+        neg = 0
+        for k in rest:
+            if not m:
+                break
+            sign, val = k
+            if sign == '+':
+                m &= self.column(val)
+            elif sign == '-':
+                neg |= self.column(val)
+            else:
+                m &= self.expr(lits[k])
+        m &= ~neg
+        self.conjs[key] = m
+        if len(self.conjs) > self.max_conj:
+            self.conjs.popitem(last=False)
+        return m
+
+# ------------------ Parsing do RIS ------------------
+
+_DOI_URL  = re.compile(r'(doi\.org/\S+)', re.IGNORECASE)
+_DOI_BARE = re.compile(r'(10\.\d{4,9}/[^\s]+)')
+_FNAME    = re.compile(r'[^\w\-]')
 
 def clean_id(raw: str) -> str:
     # isola apenas doi.org/... ou 10.xxxx/...
-    m = re.search(r'(doi\.org/\S+)', raw, flags=re.IGNORECASE)
+    m = _DOI_URL.search(raw)
     if m:
         return m.group(1)
-    m = re.search(r'(10\.\d{4,9}/[^\s]+)', raw)
+    m = _DOI_BARE.search(raw)
     if m:
         return m.group(1)
     return raw.strip()
 
+# tags usadas na busca (texto) e na identificação do item
+TEXT_TAGS = ('TI', 'AB', 'KW')
+ID_TAGS   = ('DO', 'UR')
+# separador entre campos: não aparece em termos, então nenhum termo casa
+# atravessando o limite entre título, resumo e palavras-chave
+FIELD_SEP = '\x1f'
+
+class Entry:
+    """ Entrada do RIS já pronta para busca: texto em minúsculas e ID limpo.
+    O texto fica em bytes UTF-8 (1 byte por caractere ASCII, em vez de até
+    4 no str), e a busca de substring roda direto sobre ele. """
+    __slots__ = ('search_text', 'cid')
+    def __init__(self, search_text: bytes, cid: str):
+        self.search_text = search_text
+        self.cid = cid
+
+# linhas de interesse (e o ER que fecha cada entrada), localizadas direto
+# nos bytes do arquivo mapeado numa única varredura
+_TAG_LINE = re.compile(
+    rb'^(' + '|'.join(TEXT_TAGS + ID_TAGS + ('ER',)).encode() + rb')  -(.*)$',
+    re.M
+)
+_NON_BLANK = re.compile(rb'\S')
+
+def parse_ris_entries(path: Path):
+    """ Mapeia o RIS em memória e o percorre com uma única regex; só as
+    linhas TI/AB/KW/DO/UR viram str, uma vez, para montar o texto de busca
+    (em minúsculas) e o identificador limpo de cada entrada. """
+    entries = []
+    fields = {tag: [] for tag in TEXT_TAGS + ID_TAGS}
+
+    def flush():
+        texto = FIELD_SEP.join(fields['TI'] + fields['AB'] + fields['KW'])
+        raw = (fields['DO'] or fields['UR'] or [''])[0]
+        entries.append(Entry(texto.lower().encode('utf-8'), clean_id(raw)))
+        for vals in fields.values():
+            vals.clear()
+
+    with path.open('rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return entries
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            end = 0
+            for m in _TAG_LINE.finditer(mm):
+                tag = m.group(1).decode('ascii')
+                if tag == 'ER':
+                    flush()
+                    end = m.end()
+                else:
+                    fields[tag].append(
+                        m.group(2).decode('utf-8', errors='ignore').strip())
+            # resto sem ER final ainda conta como entrada
+            if _NON_BLANK.search(mm, end):
+                flush()
+    return entries
+
 # ------------------ Loop Principal ------------------
 
 def main():
@@ -151,55 +626,63 @@ def main():
 
     entries = parse_ris_entries(RIS_FILE)
     print(f"Total de entradas no RIS: {len(entries)}")
+    cache = MaskCache([ent.search_text for ent in entries])
 
-    while True:
-        query = input("\nQuery (ou SAIR para encerrar): ").strip()
-        if query.upper() == 'SAIR':
-            print("Fim.")
-            break
-
-        expr = parse_query(query)
-        dnf = ast_to_dnf(expr)
-        print(f"\nDNF gerou {len(dnf)} conjunções:")
-        # 1) listar e contar cada conjunção
-        for i, conj in enumerate(dnf, start=1):
-            count = 0
-            for ent in entries:
-                ti  = extract_tag(ent, 'TI')
-                ab  = extract_tag(ent, 'AB')
-                kws = extract_tag(ent, 'KW')
-                texto = ' '.join(ti + ab + kws)
-                if all(c.eval(texto) for c in conj):
-                    count += 1
-            expr_str = ' AND '.join(repr(c) for c in conj)
-            print(f"  {i}. {expr_str}  → {count} itens")
-
-        # 2) coleta resultados de qualquer conjunção satisfeita
-        results = []
-        for ent in entries:
-            ti  = extract_tag(ent, 'TI')
-            ab  = extract_tag(ent, 'AB')
-            kws = extract_tag(ent, 'KW')
-            texto = ' '.join(ti + ab + kws)
-            if any(all(c.eval(texto) for c in conj) for conj in dnf):
-                raw = (extract_tag(ent, 'DO') or extract_tag(ent, 'UR') or [''])[0]
-                cid = clean_id(raw)
-                if cid:
-                    results.append(cid)
-
-        if not results:
-            print("Nenhum item encontrado para essa query.")
-            continue
+    # o pool de processos (se houver) é encerrado mesmo em EOF, Ctrl-C ou erro
+    try:
+        while True:
+            query = input("\nQuery (ou SAIR para encerrar): ").strip()
+            if query.upper() == 'SAIR':
+                print("Fim.")
+                break
+
+            try:
+                expr = parse_query(query)
+            except ValueError as e:
+                print(f"Query inválida: {e}")
+                continue
+            cache.prefetch(expr_terms(expr))
+
+            n_conj = dnf_size(expr)
+            if n_conj > DNF_MAX:
+                # expandir custaria mais que avaliar: sem contagem por conjunção
+                print(f"\nDNF geraria {n_conj} conjunções; avaliando a query direto.")
+                found = cache.expr(expr)
+            else:
+                dnf = simplify_dnf(ast_to_dnf(expr))
+                print(f"\nDNF gerou {len(dnf)} conjunções:")
+                # 1) listar e contar cada conjunção
+                found = 0
+                for i, conj in enumerate(dnf, start=1):
+                    m = cache.conj(conj)
+                    found |= m
+                    label = ' AND '.join(expr_str(c) for c in conj)
+                    print(f"  {i}. {label}  → {m.bit_count()} itens")
+
+            # 2) coleta resultados de qualquer conjunção satisfeita: as máscaras
+            # já foram unidas acima, então só as entradas marcadas são visitadas
+            results = [cid for cid in (entries[i].cid for i in mask_indices(found))
+                       if cid]
+
+            if not results:
+                print("Nenhum item encontrado para essa query.")
+                continue
 
-        # salva em ~/Downloads
-        ts = datetime.now().strftime('%Y%m%d_%H%M%S')
-        safe = re.sub(r'[^\w\-]', '_', query)[:30]
-        out_file = DOWNLOADS / f"resultado_{safe}_{ts}.txt"
-        with out_file.open('w', encoding='utf-8') as f:
-            f.write(', '.join(results))
+            # salva em ~/Downloads
+            ts = datetime.now().strftime('%Y%m%d_%H%M%S')
+            safe = _FNAME.sub('_', query)[:30]
+            out_file = DOWNLOADS / f"resultado_{safe}_{ts}.txt"
+            # escreve item a item pelo buffer, sem montar a string inteira
+            with out_file.open('w', encoding='utf-8', buffering=1 << 20) as f:
+                f.write(results[0])
+                for cid in results[1:]:
+                    f.write(', ')
+                    f.write(cid)
 
-        print(f"\nTotal geral de IDs: {len(results)}")
-        print(f"Gravado em: {out_file}")
+            print(f"\nTotal geral de IDs: {len(results)}")
+            print(f"Gravado em: {out_file}")
+    finally:
+        cache.close()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
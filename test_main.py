@@ -0,0 +1,124 @@
+import unittest
+from unittest import mock
+
+import main
+
+from main import (MaskCache, parse_query, compile_program, run_program,
+                  dnf_size, expr_terms, tokenize, ast_to_dnf, simplify_dnf,
+                  Term, NotOp, AndOp)
+
+
+def reference(e, txt: str) -> bool:
+    """ Avaliação direta, entrada a entrada, para comparar com as colunas. """
+    if isinstance(e, Term):
+        return e.term in txt
+    if isinstance(e, NotOp):
+        return not reference(e.child, txt)
+    if isinstance(e, AndOp):
+        return reference(e.left, txt) and reference(e.right, txt)
+    return reference(e.left, txt) or reference(e.right, txt)
+
+
+TEXTS = [f'alpha w{i} beta' if i % 3 else f'gamma w{i}' for i in range(400)]
+
+
+class ExprEvalTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = MaskCache([t.encode() for t in TEXTS])
+
+    def check(self, query: str):
+        expr = parse_query(query)
+        expected = sum(1 << i for i, t in enumerate(TEXTS)
+                       if reference(expr, t))
+        self.assertEqual(self.cache.expr(expr), expected)
+
+    def test_small_queries(self):
+        self.check('alpha AND (beta OR NOT gamma)')
+        self.check('NOT (alpha AND beta) OR (gamma AND NOT w1)')
+        self.check('zzz AND alpha')
+
+    def test_300_term_or(self):
+        self.check(' OR '.join(f'w{i}' for i in range(300)) + ' OR alpha')
+
+    def test_deep_not_of_or(self):
+        inner = ' OR '.join(f'(w{i})' for i in range(150))
+        self.check(f'(alpha) AND NOT ({inner})')
+
+    def test_deep_chain_helpers(self):
+        expr = parse_query(' AND '.join(f'w{i}' for i in range(3000)))
+        self.assertEqual(dnf_size(expr), 1)
+        self.assertEqual(len(expr_terms(expr)), 3000)
+        self.assertEqual(self.cache.expr(expr), 0)
+        dnf = ast_to_dnf(expr)
+        self.assertEqual(len(dnf), 1)
+        self.assertEqual(len(dnf[0]), 3000)
+        self.assertTrue(repr(expr).startswith('(' * 2999 + '"w0" AND "w1")'))
+        deep_not = parse_query('a AND NOT (' + ' OR '.join(
+            f'w{i}' for i in range(3000)) + ')')
+        [conj] = simplify_dnf(ast_to_dnf(deep_not))
+        self.assertEqual(len(conj), 2)
+        self.assertTrue(repr(conj[1]).startswith('NOT(' + '(' * 2999 + '"w0"'))
+
+    def test_dnf_expansion(self):
+        dnf = ast_to_dnf(parse_query('(a OR b) AND (c OR NOT d)'))
+        self.assertEqual(repr(dnf), '[["a", "c"], ["a", NOT("d")], '
+                                    '["b", "c"], ["b", NOT("d")]]')
+
+    def test_short_circuit(self):
+        calls = []
+        def col(term):
+            calls.append(term)
+            return self.cache.column(term)
+        run_program(compile_program(parse_query('zzz AND alpha')),
+                    col, self.cache.full)
+        run_program(compile_program(parse_query('NOT zzz OR beta')),
+                    col, self.cache.full)
+        self.assertEqual(calls, ['zzz', 'zzz'])
+
+
+class ParallelTest(unittest.TestCase):
+    def test_pool_matches_serial(self):
+        texts = [t.encode() for t in TEXTS]
+        queries = ['w1', 'alpha w2', 'beta', 'gamma w3', 'ta w', 'zzz']
+        serial = MaskCache(texts)
+        self.assertIsNone(serial.pool)
+        with mock.patch.object(main, 'PARALLEL_MIN', 10), \
+                mock.patch.object(main.os, 'cpu_count', return_value=4):
+            cache = MaskCache(texts)
+        try:
+            self.assertIsNotNone(cache.pool)
+            cache.prefetch(queries[:2])
+            cache.prefetch(queries)
+            for q in queries:
+                self.assertEqual(cache.column(q), serial.column(q), q)
+        finally:
+            cache.close()
+        self.assertIsNone(cache.pool)
+
+
+class ParseTest(unittest.TestCase):
+    def test_phrase_joining(self):
+        self.assertEqual(tokenize('machine  learning AND (deep net)'),
+                         ['machine  learning', 'AND', '(', 'deep net', ')'])
+
+    def test_lowercase_operators_split_phrases(self):
+        self.assertEqual(tokenize('rock and roll'), ['rock', 'and', 'roll'])
+        self.assertEqual(repr(parse_query('rock and roll')), '("rock" AND "roll")')
+        self.assertEqual(repr(parse_query('a or b and not c')),
+                         '("a" OR ("b" AND NOT("c")))')
+
+    def test_operator_inside_word_is_term(self):
+        self.assertEqual(tokenize('android notable'), ['android notable'])
+
+    def test_double_not(self):
+        self.assertEqual(repr(parse_query('NOT NOT x')), 'NOT(NOT("x"))')
+
+    def test_malformed(self):
+        for q in ('covid NOT vaccine', 'alpha AND', 'a OR', 'NOT', 'AND b',
+                  '', '()', 'a)', '(a) (b)'):
+            with self.assertRaises(ValueError, msg=q):
+                parse_query(q)
+
+
+if __name__ == '__main__':
+    unittest.main()